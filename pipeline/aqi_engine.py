@@ -0,0 +1,226 @@
+"""
+Pollutant-based AQI computation (CPCB India and US EPA scales).
+
+OpenWeather's own `aqi` is a coarse 1-5 band. This module turns the stored
+pollutant concentrations into the standard 0-500 indices instead:
+
+1. per-city rolling averages over each pollutant's averaging period
+   (24h / 8h / 1h, time-based so irregular collection intervals are fine),
+   left empty until the window has enough hours of data (CPCB: 16 of 24,
+   6 of 8)
+2. unit conversion (OpenWeather reports everything in µg/m³)
+3. sub-index per pollutant by piecewise-linear breakpoint interpolation
+4. overall AQI = highest sub-index, with its pollutant and category
+
+Everything is vectorized over the whole history. `add_aqi_columns` only
+recomputes rows whose averaging windows changed (new or backfilled rows
+and the rows that follow them within the longest window), so a normal
+cycle touches just the latest windows.
+"""
+
+import logging
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+
+# ------------------------------------------------------------------
+# Standards
+# ------------------------------------------------------------------
+# Molecular weights for µg/m³ -> ppb at 25 °C and 1 atm (ppb = µg/m³ * 24.45 / MW)
+MOLAR_VOLUME = 24.45
+MOLECULAR_WEIGHT = {'no2': 46.01, 'so2': 64.07, 'co': 28.01, 'o3': 48.00}
+
+# Breakpoint bands are rows of (C_low, C_high, I_low, I_high).
+# Above the last band the index is capped at that band's I_high.
+STANDARDS = {
+    'cpcb': {
+        # CPCB National AQI; CO in mg/m³, everything else in µg/m³
+        'windows': {'pm2_5': '24h', 'pm10': '24h', 'no2': '24h', 'so2': '24h',
+                    'nh3': '24h', 'co': '8h', 'o3': '8h'},
+        'scale': {'co': 1 / 1000},
+        'breakpoints': {
+            'pm2_5': [(0, 30, 0, 50), (31, 60, 51, 100), (61, 90, 101, 200),
+                      (91, 120, 201, 300), (121, 250, 301, 400), (251, 380, 401, 500)],
+            'pm10': [(0, 50, 0, 50), (51, 100, 51, 100), (101, 250, 101, 200),
+                     (251, 350, 201, 300), (351, 430, 301, 400), (431, 510, 401, 500)],
+            'no2': [(0, 40, 0, 50), (41, 80, 51, 100), (81, 180, 101, 200),
+                    (181, 280, 201, 300), (281, 400, 301, 400), (401, 520, 401, 500)],
+            'so2': [(0, 40, 0, 50), (41, 80, 51, 100), (81, 380, 101, 200),
+                    (381, 800, 201, 300), (801, 1600, 301, 400), (1601, 2400, 401, 500)],
+            'co': [(0, 1.0, 0, 50), (1.1, 2.0, 51, 100), (2.1, 10, 101, 200),
+                   (10.1, 17, 201, 300), (17.1, 34, 301, 400), (34.1, 51, 401, 500)],
+            'o3': [(0, 50, 0, 50), (51, 100, 51, 100), (101, 168, 101, 200),
+                   (169, 208, 201, 300), (209, 748, 301, 400), (749, 1000, 401, 500)],
+            'nh3': [(0, 200, 0, 50), (201, 400, 51, 100), (401, 800, 101, 200),
+                    (801, 1200, 201, 300), (1201, 1800, 301, 400), (1801, 2400, 401, 500)],
+        },
+        'categories': [(50, 'Good'), (100, 'Satisfactory'), (200, 'Moderate'),
+                       (300, 'Poor'), (400, 'Very Poor'), (500, 'Severe')],
+    },
+    'us_epa': {
+        # US EPA AQI (2024 PM2.5 revision); PM in µg/m³, O3/CO in ppm, NO2/SO2 in ppb.
+        # NH3 is not part of the EPA index. The 8-hour O3 table ends at 0.200 ppm
+        # (300); above that EPA switches to 1-hour O3, which is not measured
+        # separately here, so the O3 sub-index is capped at 300.
+        'windows': {'pm2_5': '24h', 'pm10': '24h', 'o3': '8h', 'co': '8h',
+                    'no2': '1h', 'so2': '1h'},
+        'scale': {'o3': MOLAR_VOLUME / MOLECULAR_WEIGHT['o3'] / 1000,
+                  'co': MOLAR_VOLUME / MOLECULAR_WEIGHT['co'] / 1000,
+                  'no2': MOLAR_VOLUME / MOLECULAR_WEIGHT['no2'],
+                  'so2': MOLAR_VOLUME / MOLECULAR_WEIGHT['so2']},
+        'breakpoints': {
+            'pm2_5': [(0, 9.0, 0, 50), (9.1, 35.4, 51, 100), (35.5, 55.4, 101, 150),
+                      (55.5, 125.4, 151, 200), (125.5, 225.4, 201, 300), (225.5, 325.4, 301, 500)],
+            'pm10': [(0, 54, 0, 50), (55, 154, 51, 100), (155, 254, 101, 150),
+                     (255, 354, 151, 200), (355, 424, 201, 300), (425, 604, 301, 500)],
+            'o3': [(0, 0.054, 0, 50), (0.055, 0.070, 51, 100), (0.071, 0.085, 101, 150),
+                   (0.086, 0.105, 151, 200), (0.106, 0.200, 201, 300)],
+            'co': [(0, 4.4, 0, 50), (4.5, 9.4, 51, 100), (9.5, 12.4, 101, 150),
+                   (12.5, 15.4, 151, 200), (15.5, 30.4, 201, 300), (30.5, 50.4, 301, 500)],
+            'no2': [(0, 53, 0, 50), (54, 100, 51, 100), (101, 360, 101, 150),
+                    (361, 649, 151, 200), (650, 1249, 201, 300), (1250, 2049, 301, 500)],
+            'so2': [(0, 35, 0, 50), (36, 75, 51, 100), (76, 185, 101, 150),
+                    (186, 304, 151, 200), (305, 604, 201, 300), (605, 1004, 301, 500)],
+        },
+        'categories': [(50, 'Good'), (100, 'Moderate'), (150, 'Unhealthy for Sensitive Groups'),
+                       (200, 'Unhealthy'), (300, 'Very Unhealthy'), (500, 'Hazardous')],
+    },
+}
+
+MAX_INDEX = 500
+
+# Minimum hours with data in a window before its average is used. An hour
+# counts when its first reading falls inside the window.
+MIN_COVERAGE_HOURS = {'24h': 16, '8h': 6, '1h': 1}
+INSUFFICIENT_DATA = 'Insufficient data'  # category when no pollutant has enough coverage
+
+logger = logging.getLogger(__name__)
+
+
+def output_columns(standard: str):
+    """Columns add_aqi_columns maintains for a standard"""
+    return [f'{standard}_aqi', f'{standard}_dominant', f'{standard}_category']
+
+
+def sub_index(concentrations: np.ndarray, bands) -> np.ndarray:
+    """
+    Piecewise-linear sub-index for an array of concentrations.
+
+    Each value is placed in the first band whose upper limit it does not
+    exceed, then interpolated as
+        I = (I_high - I_low) / (C_high - C_low) * (C - C_low) + I_low
+    NaN concentrations give NaN; values above the table are capped at the
+    last band's I_high.
+    """
+    table = np.asarray(bands, dtype=float)
+    values = np.asarray(concentrations, dtype=float)
+
+    band = np.minimum(np.searchsorted(table[:, 1], values, side='left'), len(table) - 1)
+    c_low, c_high, i_low, i_high = table[band].T
+    index = (i_high - i_low) / (c_high - c_low) * (values - c_low) + i_low
+    return np.clip(index, 0, min(table[-1, 3], MAX_INDEX))
+
+
+def rolling_averages(df: pd.DataFrame, windows: Dict[str, str]) -> pd.DataFrame:
+    """
+    Per-city, time-based rolling means for each pollutant's window.
+
+    `df` must be sorted by city then timestamp. Pollutants sharing a window
+    are averaged in one pass. Averages over fewer than MIN_COVERAGE_HOURS
+    hours of data are NaN.
+    """
+    averages = pd.DataFrame(index=df.index)
+    hour_start = ~df[['city']].assign(hour=df['timestamp'].dt.floor('h')).duplicated()
+    grouped = df.assign(_hour_start=hour_start.astype(float)).groupby('city', sort=False)
+
+    by_window: Dict[str, list] = {}
+    for pollutant, window in windows.items():
+        if pollutant in df.columns:
+            by_window.setdefault(window, []).append(pollutant)
+
+    for window, pollutants in by_window.items():
+        rolling = grouped.rolling(window, on='timestamp')
+        rolled = rolling[pollutants].mean()
+        hours = rolling['_hour_start'].sum().to_numpy()
+        # groupby(sort=False) on city-sorted input keeps the input row order
+        covered = hours >= MIN_COVERAGE_HOURS.get(window, 1)
+        averages[pollutants] = np.where(covered[:, None], rolled.to_numpy(), np.nan)
+    return averages
+
+
+def compute_aqi(df: pd.DataFrame, standard: str = 'cpcb') -> pd.DataFrame:
+    """
+    Sub-indices and overall AQI for every row of `df`.
+
+    Returns a frame aligned to `df.index` with one '<pollutant>' sub-index
+    column per pollutant plus 'aqi', 'dominant' and 'category'. Rows where
+    no average has enough coverage get a NaN AQI and INSUFFICIENT_DATA.
+    """
+    config = STANDARDS[standard]
+    ordered = df.sort_values(['city', 'timestamp'])
+    averages = rolling_averages(ordered, config['windows'])
+
+    indices = pd.DataFrame(index=ordered.index)
+    for pollutant in averages.columns:
+        concentration = averages[pollutant].to_numpy() * config['scale'].get(pollutant, 1)
+        indices[pollutant] = sub_index(concentration, config['breakpoints'][pollutant])
+
+    values = indices.to_numpy()
+    has_value = ~np.isnan(values).all(axis=1)
+    filled = np.where(np.isnan(values), -np.inf, values)
+    best = filled.argmax(axis=1)
+
+    overall = np.where(has_value, np.round(filled[np.arange(len(filled)), best]), np.nan)
+    limits = np.array([limit for limit, _ in config['categories']])
+    labels = np.array([label for _, label in config['categories']], dtype=object)
+    category = labels[np.minimum(np.searchsorted(limits, overall, side='left'), len(labels) - 1)]
+
+    indices['aqi'] = overall
+    indices['dominant'] = np.where(has_value, np.asarray(indices.columns[:values.shape[1]])[best], None)
+    indices['category'] = np.where(has_value, category, INSUFFICIENT_DATA)
+    return indices.reindex(df.index)
+
+
+def add_aqi_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Fill '<standard>_aqi', '_dominant' and '_category' for every standard.
+
+    Rows that already carry values are kept. Only rows that are missing a
+    category, plus same-city rows up to one averaging window after them (whose
+    averages now include the new readings), are recomputed. The rolling
+    windows are evaluated on just those rows and the window of history
+    preceding them (plus one hour, so hour coverage is counted as in a full
+    recompute).
+    """
+    columns = [col for standard in STANDARDS for col in output_columns(standard)]
+    for col in columns:
+        if col not in df.columns:
+            df[col] = np.nan if col.endswith('_aqi') else None
+
+    pending = df[[f'{standard}_category' for standard in STANDARDS]].isna().any(axis=1)
+    if not pending.any():
+        return df
+
+    max_window = max(
+        pd.Timedelta(window) for config in STANDARDS.values() for window in config['windows'].values()
+    )
+
+    ordered = df[['city', 'timestamp']].sort_values(['city', 'timestamp'])
+    timestamps = ordered['timestamp']
+    last_pending = timestamps.where(pending.loc[ordered.index]).groupby(ordered['city']).ffill()
+    affected = (timestamps - last_pending) <= max_window
+
+    first_affected = timestamps.where(affected).groupby(ordered['city']).transform('min')
+    in_context = timestamps >= first_affected - max_window - pd.Timedelta('1h')
+    context = df.loc[ordered.index[in_context.to_numpy()]]
+    targets = ordered.index[affected.to_numpy()]
+
+    for standard in STANDARDS:
+        result = compute_aqi(context, standard)
+        for col, source in zip(output_columns(standard), ['aqi', 'dominant', 'category']):
+            df.loc[targets, col] = result.loc[targets, source]
+
+    logger.info("Computed pollutant-based AQI for %s rows (%s in window context)", len(targets), len(context))
+    return df
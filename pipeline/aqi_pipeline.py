@@ -16,6 +16,11 @@ import json
 from typing import Optional, Dict, List
 import sys
 from google_sheets_writer import write_dataframe_to_sheet
+from spatial_sampling import fetch_city_samples, points_file_name, prune_point_files
+from log_config import setup_logging, new_run_id, current_run_id
+from run_history import RunHistory, FreshnessMonitor
+from snapshot_store import publish_snapshot
+from aqi_engine import add_aqi_columns
 # Suppress noisy LibreSSL warnings (harmless, but clutter launchd logs)
 import warnings
 from urllib3.exceptions import NotOpenSSLWarning
@@ -32,6 +37,10 @@ LOCAL_OUTPUT_FILE = os.path.join(BASE_DIR, "aqi_cleaned_data.csv")
 CLOUD_OUTPUT_FILE = os.path.join(GOOGLE_DRIVE_DIR, "aqi_cleaned_data.csv")
 LOG_FILE = os.path.join(BASE_DIR, "collection.log")
 STATUS_FILE = os.path.join(BASE_DIR, "status.json")
+SNAPSHOT_DIR = os.path.join(BASE_DIR, "snapshots")
+HISTORY_DB = os.path.join(BASE_DIR, "run_history.db")
+SPATIAL_OUTPUT_FILE = os.path.join(BASE_DIR, "aqi_spatial_aggregates.csv")
+SPATIAL_POINTS_DIR = os.path.join(BASE_DIR, "spatial_points")
 
 
 MAX_RETRIES = 3
@@ -39,13 +48,11 @@ RETRY_DELAY = 60
 REQUEST_TIMEOUT = 15  
 
 
-# Setup logging
+# Setup logging (JSON lines, queued writer, rotating file; see log_config.py)
 if not logging.getLogger().handlers:
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[logging.FileHandler(LOG_FILE)]
-    )
+    setup_logging(LOG_FILE)
+
+logger = logging.getLogger("aqi_pipeline")
 
 
 class AQIDataPipeline:
@@ -64,14 +71,42 @@ class AQIDataPipeline:
         self.api_key = api_key
         self.local_output = local_output
         self.cloud_output = cloud_output 
+        # Start the run ID here so setup logging shares it with the first run
+        new_run_id()
         self.base_url = "https://api.openweathermap.org/data/2.5/air_pollution"
         
         self.cities = {
             'Delhi': {'lat': 28.6139, 'lon': 77.2090},
             'Udaipur': {'lat': 24.5854, 'lon': 73.7125}
         }
+
+        # Sampling area per city for city-wide coverage (see spatial_sampling.py)
+        self.city_areas = {
+            'Delhi': {'radius_km': 25, 'spacing_km': 5},
+            'Udaipur': {'radius_km': 8, 'spacing_km': 4}
+        }
+
+        # Run history + freshness monitoring (see run_history.py)
+        expected_interval = self.get_expected_interval()
+        self.history = RunHistory(HISTORY_DB, expected_interval)
+        self.monitor = FreshnessMonitor(self.history, list(self.cities), expected_interval)
+        self.run_started = time.time()
+        self.city_outcomes = []
+        self.runs_started = 0
         
-        logging.info("Pipeline initialized")
+        logger.info("Pipeline initialized")
+    
+    def get_expected_interval(self) -> int:
+        """Scheduled run interval in seconds, from COLLECTION_INTERVAL_MINUTES (default 10)"""
+        value = os.getenv("COLLECTION_INTERVAL_MINUTES", "10")
+        try:
+            minutes = float(value)
+            if minutes <= 0:
+                raise ValueError(value)
+        except ValueError:
+            logger.warning("Invalid COLLECTION_INTERVAL_MINUTES %r; using 10 minutes", value)
+            minutes = 10
+        return int(minutes * 60)
     
     def validate_api_key(self) -> bool:
         """Validate API key before starting collection"""
@@ -80,17 +115,17 @@ class AQIDataPipeline:
             response = requests.get(test_url, timeout=REQUEST_TIMEOUT)
             
             if response.status_code == 401:
-                logging.error("Invalid API key!")
+                logger.error("Invalid API key!")
                 return False
             elif response.status_code == 200:
-                logging.info("API key validated successfully")
+                logger.info("API key validated successfully")
                 return True
             else:
-                logging.warning(f"API validation returned status {response.status_code}")
+                logger.warning("API validation returned status %s", response.status_code)
                 return False
                 
         except Exception as e:
-            logging.error(f"API validation failed: {e}")
+            logger.error("API validation failed: %s", e)
             return False
     
     def fetch_raw_data(self, city_name: str, retry_count: int = 0) -> Optional[Dict]:
@@ -101,7 +136,7 @@ class AQIDataPipeline:
         url = f"{self.base_url}?lat={coords['lat']}&lon={coords['lon']}&appid={self.api_key}"
         
         try:
-            logging.info(f"Fetching data for {city_name} (attempt {retry_count + 1}/{MAX_RETRIES})")
+            logger.info("Fetching data for %s (attempt %s/%s)", city_name, retry_count + 1, MAX_RETRIES)
             
             response = requests.get(url, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
@@ -132,37 +167,80 @@ class AQIDataPipeline:
                 'nh3': components.get('nh3', 0)
             }
             
-            logging.info(f"Successfully fetched {city_name}: AQI={result['aqi']}, PM2.5={result['pm2_5']}")
+            logger.info("Successfully fetched %s: AQI=%s, PM2.5=%s", city_name, result['aqi'], result['pm2_5'],
+                        extra={'city': city_name, 'aqi': result['aqi'], 'pm2_5': result['pm2_5']})
             return result
             
         except requests.exceptions.Timeout:
-            logging.error(f"Timeout fetching {city_name}")
+            logger.error("Timeout fetching %s", city_name)
             
         except requests.exceptions.ConnectionError:
-            logging.error(f"Connection error for {city_name}")
+            logger.error("Connection error for %s", city_name)
             
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 401:
-                logging.error(f"Authentication failed for {city_name}")
+                logger.error("Authentication failed for %s", city_name)
                 return None  # Don't retry on auth errors
             elif e.response.status_code == 429:
-                logging.error(f"Rate limit exceeded for {city_name}")
+                logger.error("Rate limit exceeded for %s", city_name)
             else:
-                logging.error(f"HTTP error {e.response.status_code} for {city_name}")
+                logger.error("HTTP error %s for %s", e.response.status_code, city_name)
                 
         except ValueError as e:
-            logging.error(f"Data validation error for {city_name}: {e}")
+            logger.error("Data validation error for %s: %s", city_name, e)
             
         except Exception as e:
-            logging.error(f"Unexpected error fetching {city_name}: {type(e).__name__} - {e}")
+            logger.error("Unexpected error fetching %s: %s - %s", city_name, type(e).__name__, e)
         
         # Retry on transient failures (network, rate limits, etc.)
         if retry_count < MAX_RETRIES - 1:
-            logging.info(f"Retrying {city_name} in {RETRY_DELAY} seconds...")
+            logger.info("Retrying %s in %s seconds...", city_name, RETRY_DELAY)
             time.sleep(RETRY_DELAY)
             return self.fetch_raw_data(city_name, retry_count + 1)
         else:
-            logging.error(f"Failed to fetch {city_name} after {MAX_RETRIES} attempts")
+            logger.error("Failed to fetch %s after %s attempts", city_name, MAX_RETRIES)
+            return None
+    
+    def fetch_history_data(self, city_name: str, start: float, end: float) -> Optional[List[Dict]]:
+        """
+        Fetch hourly historical AQI data for a city between two Unix times.
+
+        Used to backfill collection gaps. Returns records in the same shape
+        as fetch_raw_data, or None if the request fails.
+        """
+        coords = self.cities[city_name]
+        url = (f"{self.base_url}/history?lat={coords['lat']}&lon={coords['lon']}"
+               f"&start={int(start)}&end={int(end)}&appid={self.api_key}")
+
+        try:
+            logger.info("Fetching history for %s (%s to %s)", city_name,
+                        datetime.fromtimestamp(start).strftime('%Y-%m-%d %H:%M'),
+                        datetime.fromtimestamp(end).strftime('%Y-%m-%d %H:%M'))
+
+            response = requests.get(url, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+
+            records = []
+            for item in response.json().get('list', []):
+                components = item['components']
+                record = {
+                    'timestamp': datetime.fromtimestamp(item['dt']).strftime('%Y-%m-%d %H:%M:%S'),
+                    'city': city_name,
+                    'aqi': item['main']['aqi'],
+                    'pm2_5': components.get('pm2_5', 0),
+                    'pm10': components.get('pm10', 0),
+                    'no2': components.get('no2', 0),
+                    'so2': components.get('so2', 0),
+                    'co': components.get('co', 0),
+                    'o3': components.get('o3', 0),
+                    'nh3': components.get('nh3', 0)
+                }
+                if self.validate_data(record):
+                    records.append(record)
+            return records
+
+        except Exception as e:
+            logger.error("History fetch failed for %s: %s - %s", city_name, type(e).__name__, e)
             return None
     
     def validate_data(self, data: Dict) -> bool:
@@ -171,17 +249,17 @@ class AQIDataPipeline:
         
         for field in required_fields:
             if field not in data:
-                logging.error(f"Missing required field: {field}")
+                logger.error("Missing required field: %s", field)
                 return False
         
         # Validate AQI range (1-5)
         if not 1 <= data['aqi'] <= 5:
-            logging.warning(f"AQI out of range: {data['aqi']}")
+            logger.warning("AQI out of range: %s", data['aqi'])
             return False
         
         # Validate PM2.5 (should be non-negative and reasonable)
         if data['pm2_5'] < 0 or data['pm2_5'] > 2000:
-            logging.warning(f"PM2.5 out of reasonable range: {data['pm2_5']}")
+            logger.warning("PM2.5 out of reasonable range: %s", data['pm2_5'])
             return False
         
         return True
@@ -191,10 +269,11 @@ class AQIDataPipeline:
         Clean and enrich the AQI dataset.
 
         This step removes duplicates, fixes timestamps, fills missing values,
-        adds time-based analysis columns, and ensures consistent ordering.
+        adds time-based analysis columns and pollutant-based AQI (CPCB / US EPA),
+        and ensures consistent ordering.
         """
         try:
-            logging.info("Starting data cleaning...")
+            logger.info("Starting data cleaning...")
             
             original_rows = len(df)
             
@@ -202,7 +281,7 @@ class AQIDataPipeline:
             df = df.drop_duplicates(subset=['timestamp', 'city'], keep='last')
             duplicates_removed = original_rows - len(df)
             if duplicates_removed > 0:
-                logging.info(f"Removed {duplicates_removed} duplicate records")
+                logger.info("Removed %s duplicate records", duplicates_removed)
             
             
             df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
@@ -210,7 +289,7 @@ class AQIDataPipeline:
             # Remove rows with invalid timestamps
             invalid_timestamps = df['timestamp'].isna().sum()
             if invalid_timestamps > 0:
-                logging.warning(f"Removing {invalid_timestamps} rows with invalid timestamps")
+                logger.warning("Removing %s rows with invalid timestamps", invalid_timestamps)
                 df = df.dropna(subset=['timestamp'])
             
             
@@ -219,7 +298,7 @@ class AQIDataPipeline:
                 if col in df.columns:
                     missing_count = df[col].isna().sum()
                     if missing_count > 0:
-                        logging.info(f"Filling {missing_count} missing values in {col}")
+                        logger.info("Filling %s missing values in %s", missing_count, col)
                         df[col].fillna(0, inplace=True)
             
             # Add analysis columns
@@ -243,17 +322,20 @@ class AQIDataPipeline:
             outlier_mask = (df['pm2_5'] > 1500) | (df['pm10'] > 2000)
             outliers = outlier_mask.sum()
             if outliers > 0:
-                logging.warning(f"Removing {outliers} extreme outlier records")
+                logger.warning("Removing %s extreme outlier records", outliers)
                 df = df[~outlier_mask]
+
+            # CPCB / US EPA 0-500 AQI from pollutant concentrations (only new windows are recomputed)
+            df = add_aqi_columns(df)
             
             # Sort by timestamp (newest first), then by city ascending
             df = df.sort_values(['timestamp', 'city'], ascending=[False, True])
             
-            logging.info(f"Data cleaning complete. Final row count: {len(df)}")
+            logger.info("Data cleaning complete. Final row count: %s", len(df))
             return df
             
         except Exception as e:
-            logging.error(f"Error during data cleaning: {e}")
+            logger.error("Error during data cleaning: %s", e)
             raise
     
     def save_data(self, new_data: List[Dict]) -> Optional[pd.DataFrame]:
@@ -267,78 +349,143 @@ class AQIDataPipeline:
             # Convert new data to DataFrame
             new_df = pd.DataFrame(new_data)
             if len(new_df) == 0:
-                logging.warning("No new data to save")
+                logger.warning("No new data to save")
                 return None
             # Load existing data if file exists
             if os.path.exists(self.local_output):
                 try:
                     existing_df = pd.read_csv(self.local_output)
-                    logging.info(f"Loaded {len(existing_df)} existing records")
+                    logger.info("Loaded %s existing records", len(existing_df))
                     # Combine datasets
                     combined_df = pd.concat([existing_df, new_df], ignore_index=True)
                 except pd.errors.EmptyDataError:
-                    logging.warning("Existing file is empty, starting fresh")
+                    logger.warning("Existing file is empty, starting fresh")
                     combined_df = new_df
                 except Exception as e:
-                    logging.error(f"Error reading existing file: {e}")
+                    logger.error("Error reading existing file: %s", e)
                     # Backup the corrupted file
                     backup_file = self.local_output.replace('.csv', f'_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv')
                     os.rename(self.local_output, backup_file)
-                    logging.info(f"Backed up corrupted file to {backup_file}")
+                    logger.info("Backed up corrupted file to %s", backup_file)
                     combined_df = new_df
             else:
-                logging.info("Creating new data file")
+                logger.info("Creating new data file")
                 combined_df = new_df
             # Clean the combined dataset
             cleaned_df = self.clean_data(combined_df)
             # Save to CSV with error handling
             try:
-                # Create backup before overwriting
-                if os.path.exists(self.local_output):
-                    temp_backup = self.local_output + '.temp'
-                    cleaned_df.to_csv(temp_backup, index=False)
-                    os.replace(temp_backup, self.local_output)
-                else:
-                    cleaned_df.to_csv(self.local_output, index=False)
-                logging.info(f"Data saved to {self.local_output}")
-                logging.info(f"Total records: {len(cleaned_df)}")
+                # Write to a temp file and swap it in, so readers never see a partial CSV
+                temp_backup = self.local_output + '.temp'
+                cleaned_df.to_csv(temp_backup, index=False)
+                os.replace(temp_backup, self.local_output)
+                logger.info("Data saved to %s", self.local_output)
+                logger.info("Total records: %s", len(cleaned_df))
+                # Publish a memory-mappable snapshot for concurrent readers
+                try:
+                    publish_snapshot(cleaned_df, SNAPSHOT_DIR)
+                except Exception as e:
+                    logger.error("Failed to publish snapshot: %s", e)
                 # Save cloud copy after successful local save
                 try:
                     os.makedirs(os.path.dirname(self.cloud_output), exist_ok=True)
                 except PermissionError:
-                    logging.warning("Google Drive not available; skipping cloud save")
+                    logger.warning("Google Drive not available; skipping cloud save")
                     return cleaned_df
-                cleaned_df.to_csv(self.cloud_output, index=False)
-                logging.info(f"Cloud copy saved to {self.cloud_output}")
+                cloud_temp = self.cloud_output + '.temp'
+                cleaned_df.to_csv(cloud_temp, index=False)
+                os.replace(cloud_temp, self.cloud_output)
+                logger.info("Cloud copy saved to %s", self.cloud_output)
                 return cleaned_df
             except PermissionError:
-                logging.error(f"Permission denied writing to {self.local_output}. File may be open in another program.")
+                logger.error("Permission denied writing to %s. File may be open in another program.", self.local_output)
                 return None
             except Exception as e:
-                logging.error(f"Error saving file: {e}")
+                logger.error("Error saving file: %s", e)
                 return None
         except Exception as e:
-            logging.error(f"Unexpected error in save_data: {e}")
+            logger.error("Unexpected error in save_data: %s", e)
             return None
     
-    def save_status(self, status: str, records_collected: int, errors: List[str]):
-        """Save collection status to JSON file"""
+    def collect_spatial_samples(self) -> Optional[pd.DataFrame]:
+        """
+        Fetch a grid of points over each city and store per-city aggregates.
+
+        Raw per-point readings are kept as a compressed .npz per cycle
+        (the newest week is retained); the aggregates (mean, p95, max) are appended to their own CSV so
+        the main single-point history is left untouched.
+        """
+        try:
+            readings = fetch_city_samples(self.base_url, self.api_key, self.cities, self.city_areas)
+
+            os.makedirs(SPATIAL_POINTS_DIR, exist_ok=True)
+            readings.save(os.path.join(SPATIAL_POINTS_DIR, points_file_name()))
+            prune_point_files(SPATIAL_POINTS_DIR)
+
+            aggregate_df = pd.DataFrame(readings.aggregate(datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            write_header = not os.path.exists(SPATIAL_OUTPUT_FILE)
+            aggregate_df.to_csv(SPATIAL_OUTPUT_FILE, mode='a', header=write_header, index=False)
+            logger.info("Spatial aggregates saved for %s cities", len(aggregate_df))
+
+            for city in aggregate_df.loc[aggregate_df['points_ok'] == 0, 'city']:
+                logger.warning("Spatial sampling: no valid points for %s", city, extra={'city': city})
+            if not readings.ok.any():
+                logger.warning("Spatial sampling returned no valid points")
+                return None
+            return aggregate_df
+
+        except Exception as e:
+            logger.error("Spatial sampling failed: %s - %s", type(e).__name__, e)
+            return None
+    
+    def backfill_gaps(self) -> int:
+        """Fill recorded collection gaps from the history endpoint"""
+        try:
+            return self.monitor.backfill(
+                self.fetch_history_data,
+                lambda records: self.save_data(records) is not None
+            )
+        except Exception as e:
+            logger.error("Backfill failed: %s - %s", type(e).__name__, e)
+            return 0
+    
+    def save_status(self, status: str, records_collected: int, errors: List[str], backfill: bool = False):
+        """
+        Record the run in the history store and save a status summary.
+
+        With `backfill`, gaps detected while recording the run are filled
+        before status.json is written, so its health report (computed from
+        the history store's maintained aggregates) reflects the backfill.
+        """
+        try:
+            self.history.record_run(
+                current_run_id(), self.run_started, time.time(), status,
+                records_collected, errors, self.city_outcomes
+            )
+        except Exception as e:
+            logger.error("Error recording run history: %s", e)
+
+        if backfill:
+            self.backfill_gaps()
+
         try:
             status_data = {
+                'run_id': current_run_id(),
                 'last_run': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                 'status': status,
                 'records_collected': records_collected,
                 'errors': errors,
-                'total_records_in_file': self.get_total_records()
+                'total_records_in_file': self.get_total_records(),
+                'health': self.monitor.report()
             }
             
             with open(STATUS_FILE, 'w') as f:
                 json.dump(status_data, f, indent=2)
                 
-            logging.info(f"Status saved: {status}")
+            logger.info("Status saved: %s", status)
             
         except Exception as e:
-            logging.error(f"Error saving status: {e}")
+            logger.error("Error saving status: %s", e)
     
     def get_total_records(self) -> int:
         """Get total number of records in CSV file"""
@@ -362,11 +509,14 @@ class AQIDataPipeline:
         """
         start_time = datetime.now()
         errors = []
+        if self.runs_started:
+            new_run_id()
+        self.runs_started += 1
+        self.run_started = time.time()
+        self.city_outcomes = []
         
         try:
-            logging.info("="*60)
-            logging.info(f"Collection started at {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
-            logging.info("="*60)
+            logger.info("Collection started", extra={'event': 'run_start', 'cities': list(self.cities)})
             
             # Validate API key first
             if not self.validate_api_key():
@@ -377,23 +527,30 @@ class AQIDataPipeline:
             # Collect data for all cities
             raw_data = []
             for city in self.cities.keys():
+                fetch_started = time.time()
                 city_data = self.fetch_raw_data(city)
+                ok = bool(city_data) and self.validate_data(city_data)
+                self.city_outcomes.append({
+                    'city': city,
+                    'ok': ok,
+                    'latency_s': round(time.time() - fetch_started, 3),
+                    'rows': 1 if ok else 0
+                })
                 
                 if city_data:
                     # Validate data
-                    if self.validate_data(city_data):
+                    if ok:
                         raw_data.append(city_data)
                     else:
-                        error_msg = f"Invalid data received for {city}"
-                        logging.error(error_msg)
-                        errors.append(error_msg)
+                        logger.error("Invalid data received for %s", city, extra={'city': city})
+                        errors.append(f"Invalid data received for {city}")
                 else:
                     error_msg = f"Failed to fetch data for {city}"
                     errors.append(error_msg)
             
             # Check if we got any data
             if not raw_data:
-                logging.error("No data collected from any city!")
+                logger.error("No data collected from any city!")
                 self.save_status("FAILED", 0, errors)
                 return False
             
@@ -407,35 +564,43 @@ class AQIDataPipeline:
 
                     if ENABLE_GOOGLE_UPLOAD:
                         write_dataframe_to_sheet(result_df)
-                        logging.info("Google Sheet updated successfully")
+                        logger.info("Google Sheet updated successfully")
                     else:
-                        logging.info("Google Sheet upload disabled via environment variable")
+                        logger.info("Google Sheet upload disabled via environment variable")
 
                 except Exception as e:
-                    logging.error(f"Failed to update Google Sheet: {e}")
+                    logger.error("Failed to update Google Sheet: %s", e)
+
+                # City-wide grid sampling (many API calls, so opt-in)
+                ENABLE_SPATIAL_SAMPLING = os.getenv("ENABLE_SPATIAL_SAMPLING", "false").lower() == "true"
+                if ENABLE_SPATIAL_SAMPLING:
+                    if self.collect_spatial_samples() is None:
+                        errors.append("Spatial sampling failed")
 
                 end_time = datetime.now()
                 duration = (end_time - start_time).total_seconds()
 
-                logging.info("="*60)
-                logging.info("Collection successful")
-                logging.info(f"  Records collected: {len(raw_data)}")
-                logging.info(f"  Total records in file: {len(result_df)}")
-                logging.info(f"  Duration: {duration:.2f} seconds")
-                logging.info("="*60)
+                logger.info(
+                    "Collection successful: %s records collected, %s in file, %.2f seconds",
+                    len(raw_data), len(result_df), duration,
+                    extra={'event': 'run_end', 'records_collected': len(raw_data),
+                           'total_records': len(result_df), 'duration_s': round(duration, 3)}
+                )
+
+                # Fill gaps detected by the freshness monitor (e.g. missed launchd runs)
+                ENABLE_BACKFILL = os.getenv("ENABLE_BACKFILL", "true").lower() == "true"
+                self.save_status("SUCCESS", len(raw_data), errors if errors else [], backfill=ENABLE_BACKFILL)
 
-                self.save_status("SUCCESS", len(raw_data), errors if errors else [])
                 return True
             else:
-                logging.error("Failed to save data")
+                logger.error("Failed to save data")
                 errors.append("Data save failed")
                 self.save_status("FAILED", len(raw_data), errors)
                 return False
                 
         except Exception as e:
-            error_msg = f"Unexpected error in main collection: {type(e).__name__} - {e}"
-            logging.error(error_msg)
-            errors.append(error_msg)
+            logger.error("Unexpected error in main collection: %s - %s", type(e).__name__, e)
+            errors.append(f"Unexpected error in main collection: {type(e).__name__} - {e}")
             self.save_status("FAILED", 0, errors)
             return False
 
@@ -451,13 +616,13 @@ def main():
     try:
         # Validate configuration
         if not API_KEY:
-            logging.error("OPENWEATHER_API_KEY environment variable not set")
+            logger.error("OPENWEATHER_API_KEY environment variable not set")
             return 1
         
         # Create output directory if it doesn't exist
         if not os.path.exists(BASE_DIR):
            os.makedirs(BASE_DIR, exist_ok=True)
-           #logging.info(f"Created base directory: {BASE_DIR}")
+           #logger.info("Created base directory: %s", BASE_DIR)
         
         # Initialize and run pipeline
         pipeline = AQIDataPipeline(API_KEY,LOCAL_OUTPUT_FILE,CLOUD_OUTPUT_FILE)
@@ -467,11 +632,11 @@ def main():
         return 0 if success else 1
         
     except KeyboardInterrupt:
-        logging.info("Collection interrupted by user")
+        logger.info("Collection interrupted by user")
         return 1
         
     except Exception as e:
-        logging.error(f"Fatal error: {type(e).__name__} - {e}")
+        logger.error("Fatal error: %s - %s", type(e).__name__, e)
         return 1
 
 if __name__ == "__main__":
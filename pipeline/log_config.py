@@ -0,0 +1,215 @@
+"""
+Logging setup for the AQI pipeline.
+
+Log records are pushed onto an in-memory queue by the pipeline and written
+by a background thread as one JSON object per line. The log file is rotated
+by size and daily at midnight, and rotated files are gzip-compressed. Every line
+carries the run ID of the collection cycle it belongs to, which is also
+stored in status.json.
+
+Per-module levels can be set with the LOG_LEVELS environment variable,
+e.g. LOG_LEVELS="spatial_sampling=DEBUG,urllib3=WARNING".
+"""
+
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import time
+import uuid
+from datetime import datetime
+from typing import Optional
+
+
+# ------------------------------------------------------------------
+# Configuration
+# ------------------------------------------------------------------
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_ROTATE_INTERVAL = 24 * 60 * 60  # seconds, counted from local midnight
+LOG_BACKUP_COUNT = 14
+
+# Attributes present on every LogRecord; anything else came in via `extra=`
+_RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'run_id'}
+
+_run_id = '-'
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def new_run_id() -> str:
+    """Start a new collection run and return its ID"""
+    global _run_id
+    _run_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    return _run_id
+
+
+def current_run_id() -> str:
+    return _run_id
+
+
+class RunIdFilter(logging.Filter):
+    """Tag each record with the active run ID"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.run_id = _run_id
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a record as a single-line JSON object"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
+            'level': record.levelname,
+            'logger': record.name,
+            'run_id': getattr(record, 'run_id', '-'),
+            'msg': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves message formatting to the listener thread.
+
+    The stock QueueHandler formats the message in the calling thread so the
+    record can be pickled; records here never leave the process, so the
+    caller only pays for the enqueue.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class SizedTimedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotates when the file exceeds `maxBytes` or crosses an `interval`
+    boundary (counted from local midnight), whichever comes first. Rotated
+    files are gzip-compressed.
+
+    The pipeline runs as a fresh process each cycle, so the deadline must
+    not depend on when this handler was created. Like TimedRotatingFileHandler,
+    it is the first boundary after the file's last write: a file last written
+    before the boundary is rotated by the first run after it.
+    """
+
+    def __init__(self, filename: str, maxBytes: int, interval: int, backupCount: int):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding='utf-8')
+        self.interval = interval
+        self.rollover_at = self._compute_rollover()
+        self.namer = lambda name: name + '.gz'
+        self.rotator = self._compress
+
+    def _compute_rollover(self) -> float:
+        try:
+            last_write = os.path.getmtime(self.baseFilename) if os.path.getsize(self.baseFilename) else time.time()
+        except OSError:
+            last_write = time.time()
+        return self._next_boundary(last_write)
+
+    def _next_boundary(self, after: float) -> float:
+        """First interval boundary (aligned to local midnight) strictly after `after`"""
+        midnight = datetime.fromtimestamp(after).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+        return midnight + ((after - midnight) // self.interval + 1) * self.interval
+
+    @staticmethod
+    def _compress(source: str, dest: str):
+        with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = self._next_boundary(time.time())
+
+
+def _apply_module_levels(spec: str):
+    """
+    Apply "name=LEVEL,name=LEVEL" overrides to individual loggers.
+
+    Malformed entries are skipped with a warning rather than failing the run.
+    """
+    for item in spec.split(','):
+        if '=' not in item:
+            continue
+        name, level = (part.strip() for part in item.split('=', 1))
+        try:
+            logging.getLogger(name).setLevel(level.upper())
+        except (ValueError, TypeError):
+            logging.getLogger(__name__).warning("Ignoring invalid LOG_LEVELS entry: %s", item.strip())
+
+
+def setup_logging(log_file: str, level: int = logging.INFO):
+    """
+    Route all logging through a queue to a rotating JSON log file.
+
+    Safe to call more than once; only the first call installs handlers.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    file_handler = SizedTimedRotatingFileHandler(log_file, LOG_MAX_BYTES, LOG_ROTATE_INTERVAL, LOG_BACKUP_COUNT)
+    file_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(RunIdFilter())
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    _apply_module_levels(os.getenv("LOG_LEVELS", ""))
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def benchmark_logging(iterations: int = 100_000) -> float:
+    """
+    Measure the per-call cost (in microseconds) the pipeline pays for a
+    typical log line with the queue handler installed.
+    """
+    logger = logging.getLogger("benchmark")
+    start = time.perf_counter()
+    for i in range(iterations):
+        logger.info("Fetched %s: AQI=%s, PM2.5=%s", "Delhi", 5, 212.0)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_logging(os.path.join(tmp, "benchmark.log"))
+        new_run_id()
+        per_call = benchmark_logging()
+        logging.getLogger("benchmark").setLevel(logging.WARNING)
+        filtered = benchmark_logging()
+        shutdown_logging()
+
+    print(f"Enqueued log call:  {per_call:.2f} µs")
+    print(f"Filtered log call:  {filtered:.2f} µs")
@@ -0,0 +1,284 @@
+"""
+Run history and data freshness monitoring.
+
+Every collection run is appended to a small SQLite database together with
+per-city outcomes (success, latency, rows). Alongside the append-only tables
+the store maintains running aggregates per city and overall, updated in the
+same transaction as each insert, so health questions ("how stale is Delhi?",
+"what is the success rate?") are answered from a single row instead of a
+scan over history.
+
+Gaps in collection (e.g. the laptop sleeping while launchd is scheduled,
+see POSTMORTEM.md) are detected when a city next succeeds and recorded so
+they can be backfilled from OpenWeather's history endpoint.
+"""
+
+import json
+import logging
+import sqlite3
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+
+# ------------------------------------------------------------------
+# Configuration
+# ------------------------------------------------------------------
+EXPECTED_INTERVAL = 10 * 60  # default seconds between scheduled runs
+GAP_TOLERANCE = 2  # a gap is recorded after this many missed intervals
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    status TEXT NOT NULL,
+    records_collected INTEGER NOT NULL,
+    errors TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS city_runs (
+    run_id TEXT NOT NULL,
+    city TEXT NOT NULL,
+    ok INTEGER NOT NULL,
+    latency_s REAL,
+    rows INTEGER NOT NULL,
+    PRIMARY KEY (run_id, city)
+);
+
+CREATE TABLE IF NOT EXISTS gaps (
+    city TEXT NOT NULL,
+    gap_start REAL NOT NULL,
+    gap_end REAL NOT NULL,
+    missed_intervals INTEGER NOT NULL,
+    backfilled INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (city, gap_start)
+);
+CREATE INDEX IF NOT EXISTS idx_gaps_open ON gaps (backfilled);
+
+-- Maintained aggregates (one row per city / one row overall)
+CREATE TABLE IF NOT EXISTS city_health (
+    city TEXT PRIMARY KEY,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    successes INTEGER NOT NULL DEFAULT 0,
+    consecutive_failures INTEGER NOT NULL DEFAULT 0,
+    total_latency_s REAL NOT NULL DEFAULT 0,
+    total_rows INTEGER NOT NULL DEFAULT 0,
+    last_attempt_at REAL,
+    last_success_at REAL
+);
+
+CREATE TABLE IF NOT EXISTS run_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    runs INTEGER NOT NULL DEFAULT 0,
+    successful_runs INTEGER NOT NULL DEFAULT 0,
+    first_run_at REAL,
+    last_run_at REAL,
+    last_success_at REAL,
+    open_gaps INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO run_totals (id) VALUES (1);
+"""
+
+
+class RunHistory:
+    """Append-only run log with maintained per-city and overall aggregates"""
+
+    def __init__(self, db_path: str, expected_interval: int = EXPECTED_INTERVAL):
+        self.db_path = db_path
+        self.expected_interval = expected_interval
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def record_run(self, run_id: str, started_at: float, finished_at: float, status: str,
+                   records_collected: int, errors: List[str], city_outcomes: List[Dict]):
+        """
+        Append one run and its per-city outcomes, updating aggregates.
+
+        Each outcome is a dict with 'city', 'ok', 'latency_s' and 'rows'.
+        Recording a run_id twice raises sqlite3.IntegrityError and leaves the
+        store (including the aggregates) unchanged.
+        """
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, started_at, finished_at, status, records_collected, json.dumps(errors))
+            )
+
+            success = status == "SUCCESS"
+            self.conn.execute(
+                """
+                UPDATE run_totals SET
+                    runs = runs + 1,
+                    successful_runs = successful_runs + ?,
+                    first_run_at = COALESCE(first_run_at, ?),
+                    last_run_at = ?,
+                    last_success_at = CASE WHEN ? THEN ? ELSE last_success_at END
+                WHERE id = 1
+                """,
+                (int(success), started_at, started_at, success, started_at)
+            )
+
+            for outcome in city_outcomes:
+                self._record_city(run_id, started_at, outcome)
+
+    def _record_city(self, run_id: str, at: float, outcome: Dict):
+        city, ok = outcome['city'], bool(outcome['ok'])
+        latency = outcome.get('latency_s')
+        rows = outcome.get('rows', 0)
+
+        self.conn.execute(
+            "INSERT INTO city_runs VALUES (?, ?, ?, ?, ?)",
+            (run_id, city, int(ok), latency, rows)
+        )
+
+        previous = self.conn.execute(
+            "SELECT last_success_at FROM city_health WHERE city = ?", (city,)
+        ).fetchone()
+        last_success = previous['last_success_at'] if previous else None
+
+        if ok and last_success is not None:
+            missed = int((at - last_success) // self.expected_interval) - 1
+            if missed >= GAP_TOLERANCE:
+                inserted = self.conn.execute(
+                    "INSERT OR IGNORE INTO gaps (city, gap_start, gap_end, missed_intervals) VALUES (?, ?, ?, ?)",
+                    (city, last_success, at, missed)
+                ).rowcount
+                self.conn.execute("UPDATE run_totals SET open_gaps = open_gaps + ? WHERE id = 1", (inserted,))
+                logger.warning("Collection gap for %s: %s missed intervals", city, missed,
+                               extra={'city': city, 'gap_start': last_success, 'gap_end': at})
+
+        self.conn.execute(
+            """
+            INSERT INTO city_health (city, attempts, successes, consecutive_failures,
+                                     total_latency_s, total_rows, last_attempt_at, last_success_at)
+            VALUES (?, 1, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (city) DO UPDATE SET
+                attempts = attempts + 1,
+                successes = successes + excluded.successes,
+                consecutive_failures = CASE WHEN excluded.successes THEN 0 ELSE consecutive_failures + 1 END,
+                total_latency_s = total_latency_s + excluded.total_latency_s,
+                total_rows = total_rows + excluded.total_rows,
+                last_attempt_at = excluded.last_attempt_at,
+                last_success_at = COALESCE(excluded.last_success_at, last_success_at)
+            """,
+            (city, int(ok), int(not ok), latency or 0.0, rows, at, at if ok else None)
+        )
+
+    def city_health(self, city: str) -> Optional[sqlite3.Row]:
+        return self.conn.execute("SELECT * FROM city_health WHERE city = ?", (city,)).fetchone()
+
+    def totals(self) -> sqlite3.Row:
+        return self.conn.execute("SELECT * FROM run_totals WHERE id = 1").fetchone()
+
+    def open_gaps(self) -> List[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT * FROM gaps WHERE backfilled = 0 ORDER BY gap_start"
+        ).fetchall()
+
+    def mark_backfilled(self, city: str, gap_start: float):
+        with self.conn:
+            closed = self.conn.execute(
+                "UPDATE gaps SET backfilled = 1 WHERE city = ? AND gap_start = ? AND backfilled = 0",
+                (city, gap_start)
+            ).rowcount
+            self.conn.execute("UPDATE run_totals SET open_gaps = open_gaps - ? WHERE id = 1", (closed,))
+
+
+class FreshnessMonitor:
+    """Answers staleness and health questions from RunHistory aggregates"""
+
+    def __init__(self, history: RunHistory, cities: List[str], expected_interval: int = EXPECTED_INTERVAL):
+        self.history = history
+        self.cities = cities
+        self.expected_interval = expected_interval
+
+    def staleness(self, city: str, now: Optional[float] = None) -> Optional[float]:
+        """Seconds since the last successful fetch for a city (None if never)"""
+        row = self.history.city_health(city)
+        if row is None or row['last_success_at'] is None:
+            return None
+        return (now or time.time()) - row['last_success_at']
+
+    def is_stale(self, city: str, now: Optional[float] = None) -> bool:
+        age = self.staleness(city, now)
+        return age is None or age > self.expected_interval * GAP_TOLERANCE
+
+    def city_report(self, city: str, now: Optional[float] = None) -> Dict:
+        """Success rate, average latency and staleness for one city"""
+        row = self.history.city_health(city)
+        if row is None:
+            return {'city': city, 'attempts': 0, 'stale': True}
+
+        age = self.staleness(city, now)
+        return {
+            'city': city,
+            'attempts': row['attempts'],
+            'success_rate': round(row['successes'] / row['attempts'], 4),
+            'avg_latency_s': round(row['total_latency_s'] / row['attempts'], 3),
+            'consecutive_failures': row['consecutive_failures'],
+            'staleness_s': round(age, 1) if age is not None else None,
+            'stale': self.is_stale(city, now)
+        }
+
+    def report(self, now: Optional[float] = None) -> Dict:
+        """
+        Overall uptime plus a report per configured city.
+
+        `uptime` is successful runs over the runs the schedule expected
+        between the first and last run, so missed runs (e.g. while the
+        laptop sleeps) count against it. `run_success_rate` only covers
+        runs that actually happened.
+        """
+        totals = self.history.totals()
+        runs = totals['runs']
+        if runs:
+            expected_runs = max(1, int((totals['last_run_at'] - totals['first_run_at']) // self.expected_interval) + 1)
+            uptime = round(min(1.0, totals['successful_runs'] / expected_runs), 4)
+            success_rate = round(totals['successful_runs'] / runs, 4)
+        else:
+            uptime = success_rate = None
+        return {
+            'runs': runs,
+            'uptime': uptime,
+            'run_success_rate': success_rate,
+            'last_success': (datetime.fromtimestamp(totals['last_success_at']).strftime('%Y-%m-%d %H:%M:%S')
+                             if totals['last_success_at'] else None),
+            'open_gaps': totals['open_gaps'],
+            'cities': [self.city_report(city, now) for city in self.cities]
+        }
+
+    def backfill(self, fetch_history: Callable[[str, float, float], Optional[List[Dict]]],
+                 save: Callable[[List[Dict]], bool]) -> int:
+        """
+        Fetch data for every open gap, save it, and mark the gaps backfilled.
+
+        `fetch_history(city, start, end)` returns records for the interval,
+        or None on failure (that gap then stays open for the next run).
+        Gaps are only closed once `save` reports the records were stored.
+        """
+        records, filled = [], []
+        for gap in self.history.open_gaps():
+            rows = fetch_history(gap['city'], gap['gap_start'], gap['gap_end'])
+            if rows is None:
+                continue
+            records.extend(rows)
+            filled.append(gap)
+
+        if not filled:
+            return 0
+        if records and not save(records):
+            logger.error("Backfill save failed; %s gaps left open", len(filled))
+            return 0
+
+        for gap in filled:
+            self.history.mark_backfilled(gap['city'], gap['gap_start'])
+        logger.info("Backfilled %s records across %s gaps", len(records), len(filled))
+        return len(records)
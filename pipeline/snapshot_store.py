@@ -0,0 +1,176 @@
+"""
+Read-only, memory-mappable snapshots of the cleaned AQI dataset.
+
+After each successful save the pipeline publishes the dataset as an
+immutable, versioned NumPy structured array (.npy). Readers such as the
+notebook or dashboards open it with mmap instead of parsing the CSV, so
+several processes share the same pages through the OS cache.
+
+Text columns (city, categories, dates) are stored as small integer codes
+with a JSON label table next to the array, which keeps records compact.
+Pollutant and AQI values stay float64 so readers see exactly the values
+in the CSV.
+The layout is still row-major: `snap['pm2_5']` is a zero-copy but strided
+view, so reading one column touches every page of the file.
+
+A small CURRENT file names the latest version. It is replaced atomically
+after the snapshot is fully written, so a reader always sees a complete,
+consistent snapshot without taking any locks.
+"""
+
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# ------------------------------------------------------------------
+# Configuration
+# ------------------------------------------------------------------
+CURRENT_FILE = "CURRENT"
+KEEP_SNAPSHOTS = 5  # older versions are removed (open mmaps stay valid)
+SNAPSHOT_PATTERN = re.compile(r"^aqi_v(\d{6})\.npy$")
+SNAPSHOT_FILE_PATTERN = re.compile(r"^aqi_v(\d{6})\.(npy|labels\.json)$")
+
+logger = logging.getLogger(__name__)
+
+
+def _snapshot_name(version: int) -> str:
+    return f"aqi_v{version:06d}.npy"
+
+
+def _labels_name(version: int) -> str:
+    return f"aqi_v{version:06d}.labels.json"
+
+
+def _to_structured(df: pd.DataFrame) -> Tuple[np.ndarray, Dict[str, List[str]]]:
+    """
+    Convert a DataFrame to a structured array with compact column types.
+
+    Text columns become integer codes (-1 for missing); their labels are
+    returned separately as {column: [label, ...]}. Integer columns without
+    missing values are narrowed; other numeric columns are kept as float64.
+    """
+    fields, columns, labels = [], [], {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = series.to_numpy(dtype='datetime64[s]')
+        elif pd.api.types.is_bool_dtype(series):
+            values = series.to_numpy(dtype=bool)
+        elif pd.api.types.is_integer_dtype(series) and not series.isna().any():
+            values = series.to_numpy(dtype=np.int64)
+            if len(values):
+                values = values.astype(np.result_type(np.min_scalar_type(values.min()), np.min_scalar_type(values.max())))
+        elif pd.api.types.is_numeric_dtype(series):
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            # dates, labels and any other objects are stored as integer codes
+            codes, uniques = pd.factorize(series.where(series.isna(), series.astype(str)))
+            dtype = next(t for t in (np.int8, np.int16, np.int32, np.int64) if len(uniques) <= np.iinfo(t).max)
+            values = codes.astype(dtype)
+            labels[str(col)] = [str(label) for label in uniques]
+        fields.append((str(col), values.dtype))
+        columns.append(values)
+
+    array = np.empty(len(df), dtype=fields)
+    for (name, _), values in zip(fields, columns):
+        array[name] = values
+    return array, labels
+
+
+def current_version(snapshot_dir: str) -> Optional[int]:
+    """Version named by the CURRENT pointer, or None if nothing is published"""
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT_FILE)) as f:
+            match = SNAPSHOT_PATTERN.match(f.read().strip())
+    except FileNotFoundError:
+        return None
+    return int(match.group(1)) if match else None
+
+
+def publish_snapshot(df: pd.DataFrame, snapshot_dir: str) -> str:
+    """
+    Write `df` as the next snapshot version and point CURRENT at it.
+
+    The snapshot and its label table are written under temporary names,
+    fsynced and renamed before CURRENT is swapped, so readers never observe a partial file.
+    Returns the path of the published snapshot.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    version = (current_version(snapshot_dir) or 0) + 1
+    name = _snapshot_name(version)
+    path = os.path.join(snapshot_dir, name)
+
+    array, labels = _to_structured(df)
+
+    labels_path = os.path.join(snapshot_dir, _labels_name(version))
+    labels_temp = labels_path + '.temp'
+    with open(labels_temp, 'w') as f:
+        json.dump(labels, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(labels_temp, labels_path)
+
+    temp_path = path + '.temp'
+    with open(temp_path, 'wb') as f:
+        np.save(f, array, allow_pickle=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+    pointer_temp = os.path.join(snapshot_dir, CURRENT_FILE + '.temp')
+    with open(pointer_temp, 'w') as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_temp, os.path.join(snapshot_dir, CURRENT_FILE))
+
+    logger.info("Published snapshot %s (%s rows)", name, len(df))
+    _prune(snapshot_dir, version)
+    return path
+
+
+def _prune(snapshot_dir: str, latest: int):
+    """Remove snapshots (and label tables) older than the last KEEP_SNAPSHOTS versions"""
+    for entry in os.listdir(snapshot_dir):
+        match = SNAPSHOT_FILE_PATTERN.match(entry)
+        if match and int(match.group(1)) <= latest - KEEP_SNAPSHOTS:
+            try:
+                os.remove(os.path.join(snapshot_dir, entry))
+            except OSError as e:
+                logger.warning("Could not remove old snapshot %s: %s", entry, e)
+
+
+def open_snapshot(snapshot_dir: str) -> Tuple[np.ndarray, Dict[str, List[str]]]:
+    """
+    Memory-map the current snapshot read-only.
+
+    Returns the structured array and the label table for its text columns,
+    e.g. `labels['city'][snap['city'][0]]`. Numeric columns are zero-copy
+    (strided) views such as `snap['pm2_5']`. The mapping stays valid even
+    if a newer version is published or this one is pruned.
+    """
+    version = current_version(snapshot_dir)
+    if version is None:
+        raise FileNotFoundError(f"No snapshot published in {snapshot_dir}")
+    with open(os.path.join(snapshot_dir, _labels_name(version))) as f:
+        labels = json.load(f)
+    snapshot = np.load(os.path.join(snapshot_dir, _snapshot_name(version)), mmap_mode='r', allow_pickle=False)
+    return snapshot, labels
+
+
+def load_snapshot_frame(snapshot_dir: str) -> pd.DataFrame:
+    """Current snapshot as a DataFrame (copies the data; use open_snapshot to share pages)"""
+    snapshot, labels = open_snapshot(snapshot_dir)
+    columns = {}
+    for name in snapshot.dtype.names:
+        if name in labels:
+            columns[name] = pd.Categorical.from_codes(np.asarray(snapshot[name]), categories=labels[name])
+        else:
+            columns[name] = np.asarray(snapshot[name])
+    return pd.DataFrame(columns)
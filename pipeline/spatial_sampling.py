@@ -0,0 +1,333 @@
+"""
+Spatial sampling for city-wide AQI coverage.
+
+A single lat/lon point per city only describes one neighbourhood. This module
+spreads a grid of sample points over each metro area, fetches all of them
+through a shared, rate-limited thread pool and reduces the readings into
+per-city aggregates (mean, p95, max) with NumPy.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# ------------------------------------------------------------------
+# Configuration
+# ------------------------------------------------------------------
+READING_COLUMNS = ['aqi', 'pm2_5', 'pm10', 'no2', 'so2', 'co', 'o3', 'nh3']
+KM_PER_DEGREE_LAT = 111.32
+
+MAX_WORKERS = 8
+MAX_REQUESTS_PER_SECOND = 1.0  # OpenWeather free tier allows 60 calls/minute
+MAX_ATTEMPTS = 3
+REQUEST_TIMEOUT = 15
+PERCENTILE = 95
+KEEP_POINT_FILES = 7 * 144  # one week of 10-minute cycles
+POINT_FILE_PATTERN = re.compile(r"^points_\d{8}_\d{6}\.npz$")
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------------------------------------
+# Point generation
+# ------------------------------------------------------------------
+def generate_grid(lat: float, lon: float, radius_km: float, spacing_km: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Square grid of points every `spacing_km`, clipped to a circle of
+    `radius_km` around the city centre. Returns (lats, lons).
+    """
+    if spacing_km <= 0:
+        raise ValueError("spacing_km must be positive")
+
+    steps = int(radius_km // spacing_km)
+    offsets = np.arange(-steps, steps + 1) * spacing_km
+    dx, dy = np.meshgrid(offsets, offsets)
+    inside = dx ** 2 + dy ** 2 <= radius_km ** 2
+
+    km_per_degree_lon = KM_PER_DEGREE_LAT * np.cos(np.radians(lat))
+    lats = lat + dy[inside] / KM_PER_DEGREE_LAT
+    lons = lon + dx[inside] / km_per_degree_lon
+    return lats, lons
+
+
+def generate_polygon_sample(polygon: Sequence[Tuple[float, float]], spacing_km: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Grid points every `spacing_km` that fall inside a (lat, lon) polygon.
+
+    Uses an even-odd ray casting test evaluated for all candidate points
+    against each polygon edge at once.
+    """
+    if spacing_km <= 0:
+        raise ValueError("spacing_km must be positive")
+
+    vertices = np.asarray(polygon, dtype=float)
+    if vertices.ndim != 2 or len(vertices) < 3:
+        raise ValueError("polygon needs at least 3 (lat, lon) vertices")
+
+    min_lat, min_lon = vertices.min(axis=0)
+    max_lat, max_lon = vertices.max(axis=0)
+    mid_lat = (min_lat + max_lat) / 2
+
+    lat_step = spacing_km / KM_PER_DEGREE_LAT
+    lon_step = spacing_km / (KM_PER_DEGREE_LAT * np.cos(np.radians(mid_lat)))
+    grid_lat, grid_lon = np.meshgrid(
+        np.arange(min_lat, max_lat + lat_step / 2, lat_step),
+        np.arange(min_lon, max_lon + lon_step / 2, lon_step),
+        indexing='ij'
+    )
+    lats = grid_lat.ravel()
+    lons = grid_lon.ravel()
+
+    # Edges (y1, x1) -> (y2, x2), broadcast against every point
+    y1, x1 = vertices[:, 0][:, None], vertices[:, 1][:, None]
+    y2, x2 = np.roll(vertices, -1, axis=0)[:, 0][:, None], np.roll(vertices, -1, axis=0)[:, 1][:, None]
+    crosses = (y1 > lats) != (y2 > lats)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_at_lat = x1 + (lats - y1) * (x2 - x1) / (y2 - y1)
+    inside = (crosses & (lons < x_at_lat)).sum(axis=0) % 2 == 1
+
+    return lats[inside], lons[inside]
+
+
+def sample_city(coords: Dict, area: Optional[Dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sample points for one city.
+
+    `area` may define a 'polygon' (list of (lat, lon)) or a 'radius_km'
+    around the city centre, both with an optional 'spacing_km'. Without an
+    area, or if the sample comes back empty, the city centre alone is used.
+    """
+    area = area or {}
+    spacing_km = area.get('spacing_km', 5.0)
+
+    if 'polygon' in area:
+        lats, lons = generate_polygon_sample(area['polygon'], spacing_km)
+    elif 'radius_km' in area:
+        lats, lons = generate_grid(coords['lat'], coords['lon'], area['radius_km'], spacing_km)
+    else:
+        lats, lons = np.empty(0), np.empty(0)
+
+    if len(lats) == 0:
+        lats, lons = np.array([coords['lat']]), np.array([coords['lon']])
+    return lats, lons
+
+
+# ------------------------------------------------------------------
+# Columnar readings
+# ------------------------------------------------------------------
+class PointReadings:
+    """
+    Raw per-point readings kept as parallel NumPy columns.
+
+    Each row is one sample point; `city_codes` indexes into `cities` and
+    `values` holds READING_COLUMNS. Rows that failed to fetch stay in place
+    with `ok` set to False so the point layout is preserved.
+    """
+
+    def __init__(self, cities: List[str], city_codes: np.ndarray, lats: np.ndarray, lons: np.ndarray):
+        self.cities = cities
+        self.city_codes = city_codes.astype(np.int16)
+        self.lats = lats.astype(np.float32)
+        self.lons = lons.astype(np.float32)
+        self.values = np.full((len(city_codes), len(READING_COLUMNS)), np.nan, dtype=np.float32)
+        self.ok = np.zeros(len(city_codes), dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.city_codes)
+
+    def save(self, path: str):
+        """Write the readings as a compressed .npz file"""
+        np.savez_compressed(
+            path,
+            cities=np.array(self.cities),
+            columns=np.array(READING_COLUMNS),
+            city_codes=self.city_codes,
+            lats=self.lats,
+            lons=self.lons,
+            values=self.values,
+            ok=self.ok
+        )
+
+    def aggregate(self, timestamp: str) -> List[Dict]:
+        """
+        Reduce successful readings to one record per city.
+
+        Every city gets a record; a city whose points all failed has
+        `points_ok` of 0 and NaN statistics, so outages stay visible.
+        Produces '<column>_mean', '<column>_p95' and '<column>_max' for every
+        reading column plus point counts.
+        """
+        codes = self.city_codes[self.ok]
+        values = self.values[self.ok].astype(np.float64)
+        sampled = np.bincount(self.city_codes, minlength=len(self.cities))
+
+        n_cities, n_columns = len(self.cities), len(READING_COLUMNS)
+        means = np.full((n_cities, n_columns), np.nan)
+        p95 = np.full((n_cities, n_columns), np.nan)
+        maxes = np.full((n_cities, n_columns), np.nan)
+        ok_counts = np.zeros(n_cities, dtype=int)
+
+        if len(codes):
+            self._group_stats(codes, values, means, p95, maxes, ok_counts)
+
+        records = []
+        for code, city in enumerate(self.cities):
+            record = {
+                'timestamp': timestamp,
+                'city': city,
+                'points_sampled': int(sampled[code]),
+                'points_ok': int(ok_counts[code])
+            }
+            for j, col in enumerate(READING_COLUMNS):
+                record[f'{col}_mean'] = round(float(means[code, j]), 2)
+                record[f'{col}_p95'] = round(float(p95[code, j]), 2)
+                record[f'{col}_max'] = round(float(maxes[code, j]), 2)
+            records.append(record)
+        return records
+
+    @staticmethod
+    def _group_stats(codes: np.ndarray, values: np.ndarray, means: np.ndarray, p95: np.ndarray,
+                     maxes: np.ndarray, ok_counts: np.ndarray):
+        """
+        Fill per-city rows of the output arrays for cities with readings.
+
+        Rows are grouped by sorting once on city code; sums and maxima come
+        from reduceat over the group starts and p95 is interpolated from a
+        per-column sort within each group.
+        """
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+        values = values[order]
+
+        group_cities, starts, counts = np.unique(codes, return_index=True, return_counts=True)
+        ok_counts[group_cities] = counts
+        means[group_cities] = np.add.reduceat(values, starts, axis=0) / counts[:, None]
+        maxes[group_cities] = np.maximum.reduceat(values, starts, axis=0)
+
+        # p95 with linear interpolation (same as np.percentile's default)
+        position = (counts - 1) * (PERCENTILE / 100)
+        lower = np.floor(position).astype(int)
+        upper = np.ceil(position).astype(int)
+        weight = (position - lower)[:, None]
+        sorted_values = np.empty_like(values)
+        for col in range(values.shape[1]):
+            sorted_values[:, col] = values[np.lexsort((values[:, col], codes)), col]
+        low_values = sorted_values[starts + lower]
+        p95[group_cities] = low_values + (sorted_values[starts + upper] - low_values) * weight
+
+
+# ------------------------------------------------------------------
+# Concurrent, rate-limited fetching
+# ------------------------------------------------------------------
+class RateLimiter:
+    """Thread-safe limiter that spaces calls at least 1/rate seconds apart"""
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _fetch_point(session: requests.Session, limiter: RateLimiter, base_url: str, api_key: str,
+                 lat: float, lon: float) -> Optional[List[float]]:
+    """Fetch one sample point, returning READING_COLUMNS values or None"""
+    params = {'lat': round(lat, 4), 'lon': round(lon, 4), 'appid': api_key}
+
+    for attempt in range(MAX_ATTEMPTS):
+        limiter.wait()
+        try:
+            response = session.get(base_url, params=params, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 401:
+                logger.error("Authentication failed during spatial sampling")
+                return None
+            response.raise_for_status()
+
+            aqi_info = response.json()['list'][0]
+            components = aqi_info['components']
+            return [aqi_info['main']['aqi']] + [components.get(col, 0) for col in READING_COLUMNS[1:]]
+
+        except (requests.exceptions.RequestException, KeyError, IndexError, ValueError) as e:
+            logger.debug("Point (%.4f, %.4f) attempt %s/%s failed: %s", lat, lon, attempt + 1, MAX_ATTEMPTS, e)
+
+    return None
+
+
+def fetch_city_samples(base_url: str, api_key: str, cities: Dict[str, Dict],
+                       areas: Optional[Dict[str, Dict]] = None,
+                       max_workers: int = MAX_WORKERS,
+                       rate_per_second: float = MAX_REQUESTS_PER_SECOND) -> PointReadings:
+    """
+    Sample every city and fetch all points as one batch.
+
+    All points share one HTTP session (connection pooling) and one rate
+    limiter, so the batch stays within the API quota regardless of how many
+    worker threads are used.
+    """
+    areas = areas or {}
+    names = list(cities.keys())
+
+    codes, lats, lons = [], [], []
+    for code, name in enumerate(names):
+        city_lats, city_lons = sample_city(cities[name], areas.get(name))
+        codes.append(np.full(len(city_lats), code))
+        lats.append(city_lats)
+        lons.append(city_lons)
+
+    readings = PointReadings(names, np.concatenate(codes), np.concatenate(lats), np.concatenate(lons))
+    logger.info("Spatial sampling: fetching %s points across %s cities", len(readings), len(names))
+
+    limiter = RateLimiter(rate_per_second)
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(
+                lambda point: _fetch_point(session, limiter, base_url, api_key, *point),
+                zip(readings.lats.astype(float), readings.lons.astype(float))
+            )
+            for i, result in enumerate(results):
+                if result is not None:
+                    readings.values[i] = result
+                    readings.ok[i] = True
+
+    failed = len(readings) - int(readings.ok.sum())
+    if failed:
+        logger.warning("Spatial sampling: %s/%s points failed", failed, len(readings))
+    return readings
+
+
+def points_file_name(when: Optional[datetime] = None) -> str:
+    """File name for one cycle's raw point readings"""
+    when = when or datetime.now()
+    return f"points_{when.strftime('%Y%m%d_%H%M%S')}.npz"
+
+
+def prune_point_files(points_dir: str, keep: int = KEEP_POINT_FILES):
+    """Remove all but the newest `keep` point files (names sort by time)"""
+    files = sorted(entry for entry in os.listdir(points_dir) if POINT_FILE_PATTERN.match(entry))
+    for entry in files[:-keep] if keep > 0 else files:
+        try:
+            os.remove(os.path.join(points_dir, entry))
+        except OSError as e:
+            logger.warning("Could not remove old point file %s: %s", entry, e)